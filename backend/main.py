@@ -4,17 +4,34 @@ Presidio Deep Clean API
 Isolated, containerized PII detection service.
 Only accessed when user explicitly clicks "Deep Clean" button.
 No persistence, no file access, no telemetry.
+(Opt-in exception: ANALYSIS_CACHE_SIZE > 0 keeps analyzed strings in memory
+across requests until shutdown.)
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterator, Tuple
+import asyncio
+import dataclasses
+import gc
 import logging
+import multiprocessing
+import os
+import re
+import resource
+from collections import OrderedDict
+from itertools import chain
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import orjson
+import spacy
 
 # Presidio imports
 from presidio_analyzer import AnalyzerEngine
-from presidio_analyzer.nlp_engine import NlpEngineProvider
+from presidio_analyzer.nlp_engine import NlpArtifacts, SpacyNlpEngine
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,7 +40,10 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Financial Anonymizer - Deep Clean API",
     description="Isolated Presidio service for AI-powered PII detection",
-    version="1.0.0"
+    version="1.0.0",
+    # Large scans return thousands of candidates; orjson encodes them far
+    # faster than the stdlib json encoder
+    default_response_class=ORJSONResponse
 )
 
 # CORS - localhost only for security
@@ -46,21 +66,303 @@ app.add_middleware(
 
 logger.info("Initializing Presidio engines...")
 
-# NLP Configuration - using spaCy with English model
-nlp_config = {
-    "nlp_engine_name": "spacy",
-    "models": [{"lang_code": "en", "model_name": "en_core_web_md"}]
-}
+# NLP Configuration - using spaCy with the small English model (CNN pipeline;
+# close to _md on PERSON/ORG/GPE at a fraction of the inference cost)
+nlp_models = [{"lang_code": "en", "model_name": "en_core_web_sm"}]
+
+# spaCy components Presidio never reads, excluded at load time so their
+# weights never reach memory. tagger/attribute_ruler/lemmatizer stay: the
+# context enhancer scores hits using token lemmas.
+EXCLUDED_SPACY_PIPES = ["parser", "senter"]
+
+# Batch size for spaCy's nlp.pipe(); short transaction strings batch best ~45-75
+NLP_BATCH_SIZE = 64
+
+# Unique texts per executor job. Bounded so one huge request is spread over
+# all workers without handing spaCy oversized batches.
+ANALYSIS_CHUNK_SIZE = 256
+
+# Analysis threads per server process. os.cpu_count() sees host cores, not
+# the container CPU limit, so set this to (CPU limit / WEB_CONCURRENCY).
+ANALYSIS_THREADS = int(os.environ.get("ANALYSIS_THREADS", str(os.cpu_count() or 1)))
+
+# Worker processes for large scans (0 disables), per server process. Each
+# one spawns and loads its own spaCy model (no copy-on-write sharing), so
+# the extra memory is WEB_CONCURRENCY x ANALYSIS_PROCESSES models.
+ANALYSIS_PROCESSES = int(os.environ.get("ANALYSIS_PROCESSES", "0"))
+
+# Scans with more uncached strings than this go to the process pool; below
+# it, pickling and IPC cost more than the extra cores win back
+PROCESS_POOL_THRESHOLD = int(os.environ.get("PROCESS_POOL_THRESHOLD", "2000"))
+
+# Strings with no letters and at most 3 digits (empty, "-", "#12", "$ 4.00"
+# style) skip spaCy/Presidio entirely: they cannot hold a name, card, phone,
+# account, SSN, email or URL. Two entities can still match them:
+# - IP_ADDRESS: compressed IPv6 such as "::1", so strings with a ":" are
+#   kept when it is requested
+# - DATE_TIME: short dates such as "9/11", so the filter is off entirely
+_NO_PII_TEXT = re.compile(r"^[\W_]*(?:\d[\W_]*){0,3}$")
+_NO_PII_TEXT_KEEP_COLON = re.compile(r"^(?:[^\w:]|_)*(?:\d(?:[^\w:]|_)*){0,3}$")
+
+
+def _no_pii_filter(entities: List[str]) -> Optional["re.Pattern[str]"]:
+    """Pick the pre-filter that is safe for the requested entities (None: off)."""
+    if "DATE_TIME" in entities:
+        return None
+    if "IP_ADDRESS" in entities:
+        return _NO_PII_TEXT_KEEP_COLON
+    return _NO_PII_TEXT
+
+
+# Default entities to detect (financial-focused)
+# ORGANIZATION is key for merchant classification (Tim Hortons, Netflix, etc.)
+DEFAULT_ENTITIES = (
+    "PERSON",
+    "ORGANIZATION",  # Detects business names for smart categorization
+    "PHONE_NUMBER",
+    "EMAIL_ADDRESS",
+    "CREDIT_CARD",
+    "US_SSN",
+    "US_BANK_NUMBER",
+    "IBAN_CODE",
+    "US_PASSPORT",
+    "US_DRIVER_LICENSE",
+    "IP_ADDRESS",
+    "LOCATION",
+    "URL",
+)
+
+# NER entities made of words: a text without a run of two letters cannot
+# hold one, so such texts skip the spaCy NER component
+WORD_ENTITIES = frozenset({"PERSON", "ORGANIZATION", "LOCATION", "NRP"})
+_HAS_WORD = re.compile(r"[^\W\d_]{2,}")
+
+# Clients sending `Accept: application/x-ndjson` get /scan candidates
+# streamed one JSON object per line instead of a single ScanResponse body
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Candidate lines per NDJSON chunk: one ASGI send per batch, not per line
+NDJSON_BATCH_LINES = 500
+
+# Minimum analyzer score for a finding to be reported
+SCORE_THRESHOLD = 0.5
+
+# Max unique strings whose findings are kept in memory across requests
+# (merchant names recur between sessions). Opt-in: the cached strings are
+# raw transaction text, so the default 0 keeps nothing past a request.
+ANALYSIS_CACHE_SIZE = int(os.environ.get("ANALYSIS_CACHE_SIZE", "0"))
+
+
+class SlimSpacyNlpEngine(SpacyNlpEngine):
+    """SpacyNlpEngine that loads models with spaCy's `exclude=`.
+
+    Unlike `disable=`, excluded components are never constructed, so their
+    weights cost neither load time nor RSS. Models must already be
+    installed (the image downloads them at build time).
+    """
+
+    def __init__(self, models: List[Dict[str, str]], exclude: List[str]):
+        super().__init__(models=models)
+        self.exclude = exclude
+
+    def load(self) -> None:
+        self.nlp = {}
+        for model in self.models:
+            self.nlp[model["lang_code"]] = spacy.load(model["model_name"], exclude=self.exclude)
+
+    def process_batch_without_ner(
+        self, texts: List[str], language: str, batch_size: int = 1
+    ) -> Iterator[Tuple[str, NlpArtifacts]]:
+        """Like process_batch(), but skips the NER component.
+
+        Tokens and lemmas are still produced, so pattern recognizers and
+        context enhancement behave exactly as with the full pipeline.
+        """
+        for doc in self.nlp[language].pipe(texts, batch_size=batch_size, disable=["ner"]):
+            yield doc.text, self._doc_to_nlp_artifact(doc, language)
+
 
 try:
-    provider = NlpEngineProvider(nlp_configuration=nlp_config)
-    nlp_engine = provider.create_engine()
+    nlp_engine = SlimSpacyNlpEngine(models=nlp_models, exclude=EXCLUDED_SPACY_PIPES)
+    nlp_engine.load()
+    logger.info(f"spaCy pipeline: {nlp_engine.get_nlp('en').pipe_names}")
+    # Presidio entity types the loaded NER model can actually emit, named
+    # the way Presidio reports them (includes DATE_TIME, which needs no letters)
+    _ner_config = nlp_engine.ner_model_configuration
+    SPACY_ENTITIES = frozenset(
+        _ner_config.model_to_presidio_entity_mapping.get(label, label)
+        for label in nlp_engine.get_nlp("en").get_pipe("ner").labels
+        if label not in _ner_config.labels_to_ignore
+    ) - frozenset(_ner_config.labels_to_ignore)
     analyzer = AnalyzerEngine(nlp_engine=nlp_engine)
-    logger.info("Presidio engines loaded successfully")
+    # ru_maxrss is in KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    logger.info(f"Presidio engines loaded successfully (peak RSS {peak_rss_mb:.0f} MB)")
 except Exception as e:
     logger.error(f"Failed to initialize Presidio: {e}")
     raise
 
+# Served by gunicorn --preload: workers fork after this import and share the
+# loaded model pages copy-on-write. Freezing moves everything allocated so far
+# out of the GC's reach, so collections in a worker don't touch (and copy)
+# those pages.
+gc.freeze()
+
+# spaCy releases the GIL inside its Cython/numpy NER code, so analysis jobs
+# in threads run in parallel and keep the event loop free
+executor = ThreadPoolExecutor(max_workers=ANALYSIS_THREADS)
+
+# Created on startup when ANALYSIS_PROCESSES > 0 (never at import, since
+# spawned workers import this module too)
+process_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _create_process_executor() -> ProcessPoolExecutor:
+    # spawn, not fork: the server process already runs threads
+    return ProcessPoolExecutor(
+        max_workers=ANALYSIS_PROCESSES,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_up_worker
+    )
+
+
+# Analyzer output for one span: (entity_type, start, end, score).
+# Plain tuples so cached results are immutable and cheap to share.
+Finding = Tuple[str, int, int, float]
+
+
+def _split_by_ner(texts: List[str], entities: List[str]) -> Tuple[List[str], List[str]]:
+    """Partition texts into (needs spaCy NER, pattern recognizers only)."""
+    requested = SPACY_ENTITIES.intersection(entities)
+    if not requested:
+        return [], texts
+    if not requested <= WORD_ENTITIES:
+        return texts, []
+
+    ner_texts: List[str] = []
+    plain_texts: List[str] = []
+    for text in texts:
+        (ner_texts if _HAS_WORD.search(text) else plain_texts).append(text)
+    return ner_texts, plain_texts
+
+
+def _pipe_texts(texts: List[str], with_ner: bool) -> List[Tuple[str, NlpArtifacts]]:
+    """Run spaCy over `texts` in batches, falling back to one text at a time.
+
+    If the batch raises, its texts are redone individually so one bad string
+    is logged and dropped instead of failing the whole chunk.
+    """
+    if not texts:
+        return []
+    process = nlp_engine.process_batch if with_ner else nlp_engine.process_batch_without_ner
+    try:
+        return list(process(texts, language="en", batch_size=NLP_BATCH_SIZE))
+    except Exception as e:
+        logger.warning(f"Batch NLP failed, retrying {len(texts)} texts one at a time: {e}")
+
+    processed: List[Tuple[str, NlpArtifacts]] = []
+    for text in texts:
+        try:
+            processed.extend(process([text], language="en"))
+        except Exception as e:
+            logger.warning(f"Error processing text: {e}")
+    return processed
+
+
+def _analyze_texts(texts: List[str], entities: List[str]) -> Dict[str, Tuple[Finding, ...]]:
+    """Run spaCy once over `texts` via nlp.pipe(), then Presidio per text.
+
+    Blocking; called from the executor. Texts that fail analysis are logged
+    and left out of the result.
+    """
+    # spaCy refuses texts over max_length; skip them here rather than
+    # failing the batch they land in
+    max_length = nlp_engine.get_nlp("en").max_length
+    too_long = sum(len(text) > max_length for text in texts)
+    if too_long:
+        logger.warning(f"Skipping {too_long} texts longer than {max_length} characters")
+        texts = [text for text in texts if len(text) <= max_length]
+
+    ner_texts, plain_texts = _split_by_ner(texts, entities)
+
+    analyzed: Dict[str, Tuple[Finding, ...]] = {}
+    # spaCy docs keep their input text verbatim, so doc.text is the key
+    batch = chain(_pipe_texts(ner_texts, with_ner=True), _pipe_texts(plain_texts, with_ner=False))
+    for text, nlp_artifacts in batch:
+        try:
+            results = analyzer.analyze(
+                text=text,
+                language="en",
+                entities=entities,
+                score_threshold=SCORE_THRESHOLD,
+                nlp_artifacts=nlp_artifacts
+            )
+        except Exception as e:
+            logger.warning(f"Error analyzing text: {e}")
+            continue
+        analyzed[text] = tuple((r.entity_type, r.start, r.end, r.score) for r in results)
+    return analyzed
+
+
+def _warm_up_worker() -> None:
+    """Process pool initializer: load every recognizer before real work arrives.
+
+    Importing this module in the spawned worker already built its own
+    analyzer; Presidio loads recognizers lazily on first use.
+    """
+    analyzer.analyze(text="warm up", language="en", entities=list(DEFAULT_ENTITIES))
+    logger.info(f"Analysis worker {os.getpid()} ready")
+
+
+class AnalysisCache:
+    """Bounded LRU of analyzer findings keyed by (text, entities, threshold).
+
+    Only touched from the event loop thread, so no locking is needed.
+    Memory only - cleared on shutdown.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[str, Tuple[str, ...], float], Tuple[Finding, ...]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, Tuple[str, ...], float]) -> Optional[Tuple[Finding, ...]]:
+        findings = self._entries.get(key)
+        if findings is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return findings
+
+    def put(self, key: Tuple[str, Tuple[str, ...], float], findings: Tuple[Finding, ...]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = findings
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+analysis_cache = AnalysisCache(ANALYSIS_CACHE_SIZE)
+
+
 # ============================================================================
 # DATA MODELS
 # ============================================================================
@@ -88,11 +390,44 @@ class Candidate(BaseModel):
     locations: List[Dict[str, Any]] # e.g., [{"row": 0, "field": "merchant", "start": 0, "end": 5}]
 
 
+@dataclasses.dataclass(slots=True)
+class _CandidateTally:
+    """Mutable in-loop counterpart of Candidate; converted once per response."""
+    text: str
+    type: str
+    confidence: float
+    count: int = 0
+    locations: List[Dict[str, Any]] = dataclasses.field(default_factory=list)
+
+    def to_model(self) -> Candidate:
+        return Candidate(
+            text=self.text,
+            type=self.type,
+            confidence=self.confidence,
+            count=self.count,
+            locations=self.locations
+        )
+
+
 class ScanResponse(BaseModel):
     candidates: List[Candidate]
     total_candidates: int
 
 
+async def _ndjson_lines(tallies: List[_CandidateTally]) -> AsyncIterator[bytes]:
+    """One Candidate object per line, then a final {"total_candidates": n} line.
+
+    Async so Starlette iterates it on the event loop instead of hopping to
+    the threadpool for every chunk.
+    """
+    for start in range(0, len(tallies), NDJSON_BATCH_LINES):
+        yield b"".join(
+            orjson.dumps(tally) + b"\n"
+            for tally in tallies[start:start + NDJSON_BATCH_LINES]
+        )
+    yield orjson.dumps({"total_candidates": len(tallies)}) + b"\n"
+
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
@@ -104,104 +439,143 @@ async def health_check():
         "status": "healthy",
         "service": "presidio-deep-clean",
         "isolation": "docker-container",
-        "persistence": "none"
+        "persistence": "none",
+        "analysis_cache": analysis_cache.stats()
     }
 
 
 @app.post("/scan", response_model=ScanResponse)
-async def scan_data(request: ScanRequest):
+async def scan_data(request: ScanRequest, accept: Optional[str] = Header(None)):
     """
     Run Presidio NER-based PII detection on transactions.
     Returns grouping of CANDIDATES instead of applying redaction.
+    With `Accept: application/x-ndjson` the candidates are streamed as
+    NDJSON (one Candidate per line, then {"total_candidates": n}).
     
     Security:
     - Only processes data sent in this specific request
     - No data is persisted or logged
-    - Results are returned and memory is freed
+    - Results are returned and memory is freed, unless the opt-in
+      ANALYSIS_CACHE_SIZE cache is enabled: it then keeps findings per
+      unique string in a bounded in-memory LRU until shutdown
     """
     
-    # Default entities to detect (financial-focused)
-    # ORGANIZATION is key for merchant classification (Tim Hortons, Netflix, etc.)
-    entities_to_detect = request.entities or [
-        "PERSON",
-        "ORGANIZATION",  # Detects business names for smart categorization
-        "PHONE_NUMBER", 
-        "EMAIL_ADDRESS",
-        "CREDIT_CARD",
-        "US_SSN",
-        "US_BANK_NUMBER",
-        "IBAN_CODE",
-        "US_PASSPORT",
-        "US_DRIVER_LICENSE",
-        "IP_ADDRESS",
-        "LOCATION",
-        "URL",
-    ]
-    
-    # Store candidates: Key = "text|type" -> Candidate
-    candidate_map: Dict[str, Candidate] = {}
-
-    def add_finding(text: str, entity_type: str, score: float, row_idx: int, field: str, start: int, end: int):
-        key = f"{text}|{entity_type}"
-        if key not in candidate_map:
-            candidate_map[key] = Candidate(
-                text=text,
-                type=entity_type,
-                confidence=score,
-                count=0,
-                locations=[]
-            )
-        
-        cand = candidate_map[key]
-        cand.count += 1
-        # Keep track of where it was found (useful for context, debugging)
-        # Limit location storage to avoid massive payloads for common terms
-        if len(cand.locations) < 50:
-            cand.locations.append({
-                "row": row_idx,
-                "field": field,
-                "start": start,
-                "end": end
-            })
-        
-        # Update confidence if we found a higher score
-        if score > cand.confidence:
-            cand.confidence = score
+    global process_executor
 
+    # Presidio expects a list; one copy per request, shared by every text
+    entities_to_detect = request.entities or list(DEFAULT_ENTITIES)
     
+    # Collect every field up front, keyed by exact text: merchants and
+    # boilerplate descriptions repeat a lot, so each unique string is
+    # analyzed once and its results fanned out to every row it appears in.
+    # Blank fields, and fields the no-PII pre-filter rejects, are skipped.
+    occurrences: Dict[str, List[Tuple[int, str]]] = {}
+    no_pii = _no_pii_filter(entities_to_detect)
     for i, tx in enumerate(request.transactions):
-        # Analyze description field
-        try:
-            desc_results = analyzer.analyze(
-                text=tx.description,
-                language="en",
-                entities=entities_to_detect,
-                score_threshold=0.5
-            )
-            for res in desc_results:
-                text_slice = tx.description[res.start:res.end]
-                add_finding(text_slice, res.entity_type, res.score, i, "description", res.start, res.end)
-        except Exception as e:
-            logger.warning(f"Error analyzing description at row {i}: {e}")
-        
-        # Analyze merchant field
+        for field_name, text in (("description", tx.description), ("merchant", tx.merchant)):
+            if not text.strip() or (no_pii and no_pii.match(text)):
+                continue
+            occurrences.setdefault(text, []).append((i, field_name))
+
+    # Serve strings seen in earlier requests from the cache; only the
+    # misses go through spaCy/Presidio
+    entities_key = tuple(sorted(entities_to_detect))
+    analyzed: Dict[str, Tuple[Finding, ...]] = {}
+    misses: List[str] = []
+    for text in occurrences:
+        cached = analysis_cache.get((text, entities_key, SCORE_THRESHOLD))
+        if cached is None:
+            misses.append(text)
+        else:
+            analyzed[text] = cached
+
+    chunks = [
+        misses[start:start + ANALYSIS_CHUNK_SIZE]
+        for start in range(0, len(misses), ANALYSIS_CHUNK_SIZE)
+    ]
+
+    # Large scans outgrow one process's CPU; spread them over worker processes
+    pool: Executor = executor
+    if process_executor is not None and len(misses) > PROCESS_POOL_THRESHOLD:
+        pool = process_executor
+
+    loop = asyncio.get_running_loop()
+
+    async def run_chunks(pool: Executor) -> List[Dict[str, Tuple[Finding, ...]]]:
+        return await asyncio.gather(*[
+            loop.run_in_executor(pool, _analyze_texts, chunk, entities_to_detect)
+            for chunk in chunks
+        ])
+
+    try:
         try:
-            merchant_results = analyzer.analyze(
-                text=tx.merchant,
-                language="en",
-                entities=entities_to_detect,
-                score_threshold=0.5
-            )
-            for res in merchant_results:
-                text_slice = tx.merchant[res.start:res.end]
-                add_finding(text_slice, res.entity_type, res.score, i, "merchant", res.start, res.end)
-        except Exception as e:
-            logger.warning(f"Error analyzing merchant at row {i}: {e}")
+            chunk_results = await run_chunks(pool)
+        except BrokenProcessPool as e:
+            # A dead worker (e.g. OOM-killed) breaks the pool for good:
+            # replace it for later requests and finish this one on threads
+            logger.error(f"Process pool broken, rebuilding: {e}")
+            if process_executor is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                process_executor = _create_process_executor()
+            chunk_results = await run_chunks(executor)
+    except Exception as e:
+        logger.error(f"NLP batch processing failed: {e}")
+        raise HTTPException(status_code=500, detail="NLP processing failed")
 
-    candidates_list = list(candidate_map.values())
-    # Sort by confidence (desc) then count (desc)
-    candidates_list.sort(key=lambda x: (x.confidence, x.count), reverse=True)
-    
+    for chunk_analyzed in chunk_results:
+        for text, findings in chunk_analyzed.items():
+            analysis_cache.put((text, entities_key, SCORE_THRESHOLD), findings)
+        analyzed.update(chunk_analyzed)
+
+    # Store candidates: Key = (text, type) -> tally. A tuple key reuses the
+    # existing strings instead of formatting a new "text|type" one per hit
+    candidate_map: Dict[Tuple[str, str], _CandidateTally] = {}
+    get_candidate = candidate_map.get
+
+    # Record each string's findings for every (row, field) it occurs in
+    # (inlined: this runs once per finding, so a helper call per hit is
+    # measurable). Walk strings in first-appearance order, not `analyzed`
+    # order, so output doesn't depend on what earlier requests cached or on
+    # the NER split.
+    for text, rows in occurrences.items():
+        findings = analyzed.get(text)
+        if not findings:
+            continue
+        n_rows = len(rows)
+        for entity_type, start, end, score in findings:
+            text_slice = text[start:end]
+            key = (text_slice, entity_type)
+            cand = get_candidate(key)
+            if cand is None:
+                cand = candidate_map[key] = _CandidateTally(text=text_slice, type=entity_type, confidence=score)
+
+            # One increment per unique source string instead of per occurrence
+            cand.count += n_rows
+            # Keep track of where it was found (useful for context, debugging)
+            # Limit location storage to avoid massive payloads for common terms
+            room = 50 - len(cand.locations)
+            if room > 0:
+                cand.locations.extend(
+                    {"row": row_idx, "field": field_name, "start": start, "end": end}
+                    for row_idx, field_name in rows[:room]
+                )
+
+            # Update confidence if we found a higher score
+            if score > cand.confidence:
+                cand.confidence = score
+
+    unsorted = list(candidate_map.values())
+    # Sort by confidence (desc) then count (desc); the index keeps ties in
+    # insertion order and means tuples never compare past it
+    keys = [(-c.confidence, -c.count, i) for i, c in enumerate(unsorted)]
+    keys.sort()
+    tallies = [unsorted[i] for _, _, i in keys]
+
+    if accept and NDJSON_MEDIA_TYPE in accept:
+        # orjson serializes the tallies directly, skipping the pydantic models
+        return StreamingResponse(_ndjson_lines(tallies), media_type=NDJSON_MEDIA_TYPE)
+
+    candidates_list = [cand.to_model() for cand in tallies]
     return ScanResponse(
         candidates=candidates_list,
         total_candidates=len(candidates_list)
@@ -214,10 +588,20 @@ async def scan_data(request: ScanRequest):
 
 @app.on_event("startup")
 async def startup_event():
+    global process_executor
+    if ANALYSIS_PROCESSES > 0:
+        process_executor = _create_process_executor()
+        logger.info(f"Process pool enabled: {ANALYSIS_PROCESSES} workers")
     logger.info("Deep Clean API started - isolated container mode")
     logger.info("No persistence, no file access, localhost only")
+    if ANALYSIS_CACHE_SIZE > 0:
+        logger.info(f"Analysis cache enabled: up to {ANALYSIS_CACHE_SIZE} strings kept in memory until shutdown")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    executor.shutdown(wait=False, cancel_futures=True)
+    if process_executor is not None:
+        process_executor.shutdown(wait=False, cancel_futures=True)
+    analysis_cache.clear()
     logger.info("Deep Clean API shutting down - all data cleared from memory")
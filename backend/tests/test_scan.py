@@ -0,0 +1,50 @@
+"""
+/scan endpoint tests.
+
+Importing main loads the real spaCy model, so run these where the image's
+dependencies are installed (plus pytest and httpx), from backend/:
+
+    python -m pytest tests
+"""
+
+import orjson
+from fastapi.testclient import TestClient
+
+import main
+
+
+def _transaction(description: str, merchant: str) -> dict:
+    return {
+        "date": "2024-01-01",
+        "description": description,
+        "merchant": merchant,
+        "category": "Shopping",
+        "amount": -12.5,
+        "type": "debit",
+    }
+
+
+def test_ndjson_stream_matches_json_body():
+    # More distinct emails than one NDJSON batch holds, so the stream spans
+    # several chunks
+    transactions = [
+        _transaction(f"Refund to user{i}@example.com", "-")
+        for i in range(main.NDJSON_BATCH_LINES + 20)
+    ]
+    transactions.append(_transaction("Card 4111 1111 1111 1111", "Contact: billing@example.com"))
+    payload = {"transactions": transactions}
+
+    with TestClient(main.app) as client:
+        json_response = client.post("/scan", json=payload)
+        ndjson_response = client.post("/scan", json=payload, headers={"Accept": main.NDJSON_MEDIA_TYPE})
+
+    assert json_response.status_code == 200
+    assert ndjson_response.status_code == 200
+    assert ndjson_response.headers["content-type"].startswith(main.NDJSON_MEDIA_TYPE)
+
+    body = json_response.json()
+    lines = [orjson.loads(line) for line in ndjson_response.content.splitlines()]
+
+    assert lines[:-1] == body["candidates"]
+    assert lines[-1] == {"total_candidates": body["total_candidates"]}
+    assert body["total_candidates"] == len(body["candidates"]) > main.NDJSON_BATCH_LINES